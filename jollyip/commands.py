@@ -1,20 +1,26 @@
 """All command definitions."""
 
 # Standard Library
+import os
 import re
 import sys
+import math
 import socket
 import ipaddress
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
 
 # Third Party
-from click import option, command, confirm, argument
-from icmplib import ping
+from click import echo, style, option, command, confirm, argument
+from rich.live import Live
 from rich.table import Table
+from rich.columns import Columns
 from rich.console import Console
 
 # Project
+from jollyip import fastping
 from jollyip.types import NUMBER
-from jollyip.formatting import fail, info, error, success
+from jollyip.formatting import FAIL, SUCCESS, FAIL_LABEL, SUCCESS_LABEL, info, error
 
 try:
     import stackprinter
@@ -25,119 +31,329 @@ else:
     stackprinter.set_excepthook(style="darkbg2")
     __builtins__["debug"] = debug
 
+_RANGE_RE = re.compile(r"[-,]")
+_DEC_RE = re.compile(r"[0-9]+")
+_HEX_RE = re.compile(r"[0-9a-fA-F]+")
+
+# Any character that can't appear in an IP address, subnet, or range.
+_HOSTNAME_RE = re.compile(r"[^0-9a-fA-F.:/-]")
+
+# Longest textual IPv6 address (IPv4-mapped notation) & network.
+_MAX_ADDRESS_LEN = 45
+_MAX_NETWORK_LEN = 49
+
+# Maximum number of concurrent DNS lookups.
+_MAX_RESOLVERS = 32
+
+# Per-host output is written every _OUTPUT_BATCH lines, & before waiting for replies.
+_OUTPUT_BATCH = 16
+
 
 def _verify_root():
     """Verify the command is running with root privileges."""
-    import os
-
-    uid = os.getegid()
-    if uid != 0:
-        return False
-    return True
+    return os.geteuid() == 0
 
 
 def _verify_hostname(host):
     """Verify a hostname is resolvable."""
     try:
-        resolved = socket.getaddrinfo(host, None)[0][4][0]
-        ip = ipaddress.ip_address(resolved)
+        # Skip the resolver entirely if host is a numeric address.
+        try:
+            resolved = socket.getaddrinfo(host, None, flags=socket.AI_NUMERICHOST)
+        except socket.gaierror:
+            resolved = socket.getaddrinfo(host, None)
+        ip = ipaddress.ip_address(resolved[0][4][0])
         return ip
     except (socket.gaierror, ValueError):
         return False
 
 
+def _check_length(value, limit):
+    """Reject a string too long to be an IP address or network, before parsing."""
+    if len(value) > limit:
+        raise ValueError(
+            "'{}' does not appear to be an IPv4 or IPv6 address or network".format(
+                value
+            )
+        )
+
+
+def _verify_hostnames(hosts):
+    """Resolve multiple hostnames concurrently.
+
+    Returns a tuple of resolved addresses, in the same order as hosts.
+    """
+    if not hosts:
+        return ()
+
+    with ThreadPoolExecutor(max_workers=min(len(hosts), _MAX_RESOLVERS)) as pool:
+        resolved = tuple(pool.map(_verify_hostname, hosts))
+
+    for host, ip in zip(hosts, resolved):
+        if not ip:
+            error("'{t}' is not DNS-resolvable", t=host)
+    return resolved
+
+
+def _is_hostname(section):
+    """Determine if a section of a range is a hostname rather than an IP range.
+
+    Only sections containing characters that can't be part of an IP
+    address, subnet, or range are treated as hostnames, so a mistyped
+    address is reported as such instead of being sent to DNS.
+    """
+    return _HOSTNAME_RE.search(section) is not None
+
+
 def _find_ipv6_prev(ip_range):
     """Parse an IPv6 range such as 2001:db8::1-a.
 
     Returns a tuple of valid IPv6Address objects
     """
     start_addr = ipaddress.ip_address(ip_range[0])
-    start_host = start_addr.exploded.split(":")[-1]
-    start = int(start_host, 16)
-    end = int(ip_range[1], 16) - 1
-    end_host = hex(start + end)[2:]
-    end_addr_str = ":".join(start_addr.exploded.split(":")[:-1] + [end_host])
-    end_addr = ipaddress.ip_address(end_addr_str)
+    end_addr = ipaddress.IPv6Address(int(start_addr) + int(ip_range[1], 16) - 1)
     return start_addr, end_addr
 
 
-def _parse_ip_range(range_str):
-    """Parse an IP range such as 192.0.2.1-192.0.2.9,192.0.2.100.
+def _check_scope(value):
+    """Reject IPv6 addresses with a scope ID, which integer segments can't keep."""
+    if "%" in str(value):
+        error("Scoped IPv6 addresses such as '{a}' are not supported", a=str(value))
 
-    Returns a generator of valid addresses in the range.
+
+def _address_segment(address):
+    """Get a single address as a (first, last, version) segment."""
+    _check_scope(address)
+    return int(address), int(address), address.version
+
+
+def _network_segment(net):
+    """Get the usable host range of a network as integers.
+
+    Network & broadcast addresses are excluded for IPv4, and the
+    Subnet-Router anycast address is excluded for IPv6, unless the
+    network is too small to have any other addresses.
+
+    Returns a tuple of first address, last address, & IP version.
     """
-    for section in range_str.split(","):
-        ip_range = section.split("-")
+    first = int(net.network_address)
+    last = int(net.broadcast_address)
+    if net.num_addresses > 2:
+        first += 1
+        if net.version == 4:
+            last -= 1
+    return first, last, net.version
+
 
+def _classify(section):
+    """Determine if a section of a range is a single address or subnet, or a range.
+
+    Returns "single", "range", or None if the section is neither.
+    """
+    hyphens = section.count("-")
+    if hyphens == 0:
+        return "single"
+    if hyphens == 1:
+        return "range"
+    return None
+
+
+def _range_address(value):
+    """Parse one end of a range, reporting an invalid address to the user."""
+    try:
+        _check_length(value, _MAX_ADDRESS_LEN)
+        return ipaddress.ip_address(value)
+    except ValueError as e:
+        error(str(e))
+
+
+def _range_segment(ip_range):
+    """Convert a start & end address pair to a (first, last, version) segment."""
+    start = _range_address(ip_range[0])
+
+    """
+    If item is in format '192.0.2.1-2', convert to
+    '192.0.2.1-192.0.2.2'.
+    """
+    if start.version == 4 and _DEC_RE.fullmatch(ip_range[1]):
+        last_octet = int(ip_range[1])
+        if last_octet > 255:
+            error("{o} is not a valid IPv4 octet", o=ip_range[1])
+        end = ipaddress.IPv4Address((int(start) & ~0xFF) | last_octet)
+
+    elif start.version == 6 and _HEX_RE.fullmatch(ip_range[1]):
         try:
-            if len(ip_range) == 1:
-                net = ipaddress.ip_network(ip_range[0], strict=False)
-                if net.num_addresses != 1:
-                    net = net.hosts()
-                for ip in net:
-                    yield ip
-
-            elif len(ip_range) == 2:
-                """
-                If item is a range, summarize the range into multiple
-                subnets, then flatten those subnets into a single iterable
-                of individual address objects.
-
-                If item is in format '192.0.2.1-2', convert to
-                '192.0.2.1-192.0.2.2'.
-                """
-                start = ipaddress.ip_address(ip_range[0])
-
-                if start.version == 4 and bool(re.search(r"^[0-9]+$", ip_range[1])):
-                    end_str = ".".join(ip_range[0].split(".")[:-1] + [ip_range[1]])
-                    end = ipaddress.ip_address(end_str)
-
-                elif start.version == 6 and bool(
-                    re.search(r"^[0-9a-fA-F]+$", ip_range[1])
-                ):
-                    start, end = _find_ipv6_prev(ip_range)
-
-                range_sum = tuple(ipaddress.summarize_address_range(start, end))
-                _target = tuple(ip for net in range_sum for ip in net)
-
-                for i in _target:
-                    yield i
-
-            else:
-                raise RuntimeError()
+            start, end = _find_ipv6_prev(ip_range)
         except ValueError as e:
             error(str(e))
-        except RuntimeError:
-            raise ValueError()
 
+    else:
+        end = _range_address(ip_range[1])
 
-def _process_target(target):
-    """Convert input target IP, range, or subnet to iterable of valid targets."""
-    num_hosts = 1
-    try:
-        if bool(re.search(r"-|,", target)):
-            # If target contains hyphens or commas, process it as a range
-            _target = tuple(_parse_ip_range(target))
-            num_hosts = len(_target)
+    if start.version != end.version:
+        error("{s} and {e} are not of the same version", s=str(start), e=str(end))
+    if end < start:
+        error("{s} is greater than {e}", s=str(start), e=str(end))
+
+    return int(start), int(end), start.version
+
+
+def _parse_ip_range(section):
+    """Parse a section of an IP range such as 192.0.2.1-192.0.2.9 or 192.0.2.0/24.
+
+    Returns a (first, last, version) segment, where first and last are
+    integer addresses.
+    """
+    kind = _classify(section)
+    if kind == "single":
+        try:
+            _check_length(section, _MAX_NETWORK_LEN)
+            net = ipaddress.ip_network(section, strict=False)
+        except ValueError as e:
+            error(str(e))
+        return _network_segment(net)
+    elif kind == "range":
+        return _range_segment(section.split("-"))
+    error("'{s}' is not a valid IP address, subnet, or range", s=section)
+
+
+def _iter_targets(segments):
+    """Expand (first, last, version) segments into individual target strings.
+
+    IPv4 targets are converted directly to dotted strings, without
+    creating an intermediate IPv4Address object.
+    """
+    for first, last, version in segments:
+        if version == 6:
+            for i in range(first, last + 1):
+                yield ipaddress.IPv6Address(i).compressed
         else:
-            target_base = ipaddress.ip_network(target, strict=False)
-            if target_base.num_addresses != 1:
-                """
-                If target is a network, return only the usable
-                addresses (remove network & broadcast addresses).
-                """
-                _target = target_base.hosts()
-                num_hosts = target_base.num_addresses - 2
-            else:
-                _target = target_base
-                num_hosts = target_base.num_addresses
+            for i in range(first, last + 1):
+                yield socket.inet_ntoa(i.to_bytes(4, "big"))
+
+
+def _as_range(target):
+    """Convert a range of IPs, subnets, & hostnames to (first, last, version) segments.
+
+    Hostnames are resolved concurrently once all other sections are parsed,
+    then put back in their original positions.
+    """
+    segments = []
+    hostnames = []
+    for section in target.split(","):
+        if _is_hostname(section):
+            hostnames.append((len(segments), section))
+            segments.append(None)
+        else:
+            segments.append(_parse_ip_range(section))
+
+    resolved = _verify_hostnames(tuple(host for _, host in hostnames))
+    for (index, _), ip in zip(hostnames, resolved):
+        segments[index] = _address_segment(ip)
+    return tuple(segments)
+
+
+def _as_address_or_network(target):
+    """Convert an IP address, range, or subnet to (first, last, version) segments."""
+    if _RANGE_RE.search(target) is not None:
+        # If target contains hyphens or commas, process it as a range
+        return _as_range(target)
+
+    _check_length(target, _MAX_NETWORK_LEN)
+    try:
+        return (_address_segment(ipaddress.ip_address(target)),)
     except ValueError:
-        is_resolvable = _verify_hostname(target)
-        if not is_resolvable:
-            error("'{t}' is not DNS-resolvable", t=str(target))
-        _target = (is_resolvable,)
+        """
+        If target is a network, use only the usable addresses
+        (remove network & broadcast addresses).
+        """
+        return (_network_segment(ipaddress.ip_network(target, strict=False)),)
+
+
+def _as_hostname(target):
+    """Resolve a hostname to a single (first, last, version) segment."""
+    is_resolvable = _verify_hostname(target)
+    if not is_resolvable:
+        error("'{t}' is not DNS-resolvable", t=str(target))
+    return (_address_segment(is_resolvable),)
+
 
-    return _target, num_hosts
+def _process_target(target):
+    """Convert input target IP, range, or subnet to iterable of valid targets."""
+    _check_scope(target)
+    if _RANGE_RE.search(target) is None and _is_hostname(target):
+        segments = _as_hostname(target)
+    else:
+        try:
+            segments = _as_address_or_network(target)
+        except ValueError as e:
+            error(str(e))
+
+    num_hosts = sum(last - first + 1 for first, last, _ in segments)
+    return _iter_targets(segments), num_hosts
+
+
+def _stats_table(num_targets, tx, successful, failed):
+    """Create a pretty table to summarize the output."""
+    table = Table(show_header=True, header_style="bold white", border_style="white")
+    table.add_column("Targets", style=" bold white")
+    table.add_column("Transmitted", style=" bold white")
+    table.add_column("Alive", style=" bold green")
+    table.add_column("Unreachable", style=" bold red")
+    table.add_row(str(num_targets), str(tx), str(successful), str(failed))
+    return table
+
+
+class _RttStats:
+    """Running summary of round trip times, updated once per reply.
+
+    The mean & sum of squared differences from it are kept with
+    Welford's algorithm, which stays accurate over many replies.
+    """
+
+    def __init__(self):
+        """Start with no round trip times."""
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = 0.0
+        self.max = 0.0
+
+    def add(self, rtt):
+        """Add a round trip time to the summary."""
+        if self.count == 0 or rtt < self.min:
+            self.min = rtt
+        if rtt > self.max:
+            self.max = rtt
+        self.count += 1
+        delta = rtt - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (rtt - self.mean)
+
+    def summary(self):
+        """Get the minimum, average, maximum, & standard deviation.
+
+        Returns None if there are no round trip times.
+        """
+        if self.count == 0:
+            return None
+        return self.min, self.mean, self.max, math.sqrt(self.m2 / self.count)
+
+
+def _rtt_table(rtt_stats):
+    """Create a pretty table to summarize round trip times."""
+    table = Table(show_header=True, header_style="bold white", border_style="white")
+    table.add_column("Min (ms)", style=" bold white")
+    table.add_column("Avg (ms)", style=" bold white")
+    table.add_column("Max (ms)", style=" bold white")
+    table.add_column("Std Dev (ms)", style=" bold white")
+
+    summary = rtt_stats.summary()
+    if summary is None:
+        table.add_row("-", "-", "-", "-")
+    else:
+        table.add_row(*("{:.2f}".format(i) for i in summary))
+    return table
 
 
 HELP1 = info(
@@ -203,48 +419,78 @@ def run_ping(target, timeout):
     tx = 0
     successful = 0
     failed = 0
+    rtt_stats = _RttStats()
+    lines = []
 
-    # Create a pretty table to summarize the output.
+    # Style the constant parts of each host's output once, up front.
+    resp_prefix = style("  Response from ", **SUCCESS)
+    resp_mid = style(" received in ", **SUCCESS)
+    resp_suffix = style(" ms", **SUCCESS)
+    unreach_suffix = style(" is unreachable", **FAIL)
+
+    """
+    Keep live summary tables at the bottom of the terminal, rebuilt
+    from the running stats on each refresh. Per-host output is printed
+    above them.
+    """
     console = Console()
-    table = Table(show_header=True, header_style="bold white", border_style="white")
-    table.add_column("Targets", style=" bold white")
-    table.add_column("Transmitted", style=" bold white")
-    table.add_column("Alive", style=" bold green")
-    table.add_column("Unreachable", style=" bold red")
 
-    try:
-        for host in target_iter:
-            host_str = str(host)
-            response = ping(host_str, count=1, timeout=timeout)
-            tx += 1
-
-            if not response.is_alive:
-                failed += 1
-                fail("  {host} is unreachable", host=host_str)
-            elif response.is_alive:
-                successful += 1
-                output = str(round(response.avg_rtt, 2))
-                success(
-                    "  Response from {host} received in {time} ms",
-                    host=host_str,
-                    time=output,
-                )
-
-        info("\nCompleted jolly ping to {host}\n", host=str(target))
-
-        # Add the final stats to the table and print the table
-        table.add_row(str(num_targets), str(tx), str(successful), str(failed))
-        console.print(table)
-
-    except KeyboardInterrupt:
-        info("Stopping ping to {host}", host=str(target))
-
-        # Add the current stats to the table and print the table
-        table.add_row(str(num_targets), str(tx), str(successful), str(failed))
-        console.print(table)
-
-        # Halt execution on keyboard interrupt
-        sys.exit()
-
-    except Exception as e:
-        error(str(e))
+    """
+    Live redirects stdout through the console, so click can no longer
+    tell it's writing to a terminal and would strip all styling. Tell
+    click explicitly whether to keep it.
+    """
+    write = partial(echo, color=console.is_terminal)
+
+    def flush():
+        """Write any buffered per-host output."""
+        write("".join(lines), nl=False)
+        lines.clear()
+
+    with Live(
+        get_renderable=lambda: Columns(
+            (_stats_table(num_targets, tx, successful, failed), _rtt_table(rtt_stats))
+        ),
+        console=console,
+        refresh_per_second=10,
+    ):
+        try:
+            for host_str, rtt in fastping.run(target_iter, timeout, idle=flush):
+                tx += 1
+
+                if rtt is None:
+                    failed += 1
+                    lines.append(
+                        "  " + style(host_str, **FAIL_LABEL) + unreach_suffix + "\n"
+                    )
+                else:
+                    successful += 1
+                    rtt_stats.add(rtt)
+                    output = str(round(rtt, 2))
+                    lines.append(
+                        resp_prefix
+                        + style(host_str, **SUCCESS_LABEL)
+                        + resp_mid
+                        + style(output, **SUCCESS_LABEL)
+                        + resp_suffix
+                        + "\n"
+                    )
+
+                if len(lines) >= _OUTPUT_BATCH:
+                    flush()
+
+            flush()
+
+            info(
+                "\nCompleted jolly ping to {host}\n", callback=write, host=str(target)
+            )
+
+        except KeyboardInterrupt:
+            flush()
+            info("Stopping ping to {host}", callback=write, host=str(target))
+
+            # Halt execution on keyboard interrupt
+            sys.exit()
+
+        except Exception as e:
+            error(str(e))
@@ -0,0 +1,315 @@
+"""Ping many hosts over a single raw ICMP socket per address family."""
+
+# Standard Library
+import os
+import time
+import errno
+import socket
+import struct
+import selectors
+from collections import deque
+
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+ICMPV6_ECHO_REQUEST = 128
+ICMPV6_ECHO_REPLY = 129
+
+# Maximum number of requests awaiting a reply at any one time.
+MAX_PENDING = 256
+
+IDENTIFIER = os.getpid() & 0xFFFF
+
+# Receive buffer size, large enough to hold a full window of replies.
+RECEIVE_BUFFER = 1 << 20
+
+_HEADER = struct.Struct("!BBHHH")
+_PAYLOAD = struct.Struct("!d")
+
+
+def _checksum(data):
+    """Calculate the RFC 1071 checksum of a packet.
+
+    Arguments:
+        data {bytes} -- Packet contents
+
+    Returns:
+        {int} -- 16-bit ones' complement checksum
+    """
+    if len(data) % 2:
+        data += b"\x00"
+    total = sum(struct.unpack("!{}H".format(len(data) // 2), data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def _echo_request(version, sequence):
+    """Build an ICMP echo request carrying the send time as its payload.
+
+    Arguments:
+        version {int} -- IP version
+        sequence {int} -- ICMP sequence number
+
+    Returns:
+        {bytes} -- Packet contents
+    """
+    payload = _PAYLOAD.pack(time.perf_counter())
+
+    if version == 6:
+        # The kernel calculates the checksum for ICMPv6 raw sockets.
+        header = _HEADER.pack(ICMPV6_ECHO_REQUEST, 0, 0, IDENTIFIER, sequence)
+        return header + payload
+
+    header = _HEADER.pack(ICMP_ECHO_REQUEST, 0, 0, IDENTIFIER, sequence)
+    checksum = _checksum(header + payload)
+    header = _HEADER.pack(ICMP_ECHO_REQUEST, 0, checksum, IDENTIFIER, sequence)
+    return header + payload
+
+
+def _echo_reply(version, packet):
+    """Parse an ICMP echo reply sent in response to one of our requests.
+
+    Arguments:
+        version {int} -- IP version
+        packet {bytes} -- Packet contents
+
+    Returns:
+        {tuple|None} -- Sequence number & send time of the request
+    """
+    reply_type = ICMPV6_ECHO_REPLY
+
+    if version == 4:
+        # IPv4 raw sockets include the IP header, IPv6 raw sockets do not.
+        packet = packet[(packet[0] & 0x0F) * 4 :]
+        reply_type = ICMP_ECHO_REPLY
+
+    if len(packet) < _HEADER.size + _PAYLOAD.size:
+        return None
+
+    icmp_type, _, _, identifier, sequence = _HEADER.unpack_from(packet)
+
+    if icmp_type != reply_type or identifier != IDENTIFIER:
+        return None
+
+    (sent,) = _PAYLOAD.unpack_from(packet, _HEADER.size)
+    return sequence, sent
+
+
+def _packed(version, address):
+    """Convert an address string to bytes.
+
+    Arguments:
+        version {int} -- IP version
+        address {str} -- IP address
+
+    Returns:
+        {bytes} -- Packed address
+    """
+    family = socket.AF_INET6 if version == 6 else socket.AF_INET
+    return socket.inet_pton(family, address)
+
+
+def _open_socket(version):
+    """Open a non-blocking raw ICMP socket.
+
+    Arguments:
+        version {int} -- IP version
+
+    Returns:
+        {socket} -- Raw ICMP or ICMPv6 socket
+    """
+    if version == 6:
+        sock = socket.socket(socket.AF_INET6, socket.SOCK_RAW, socket.IPPROTO_ICMPV6)
+    else:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECEIVE_BUFFER)
+    sock.setblocking(False)
+    return sock
+
+
+class _Session:
+    """Sockets & outstanding requests for a single run."""
+
+    def __init__(self, targets, timeout):
+        """Start a session with no requests sent.
+
+        Arguments:
+            targets {iterable} -- IP address strings to ping
+            timeout {int|float} -- Seconds to wait for each reply
+        """
+        self.targets = iter(targets)
+        self.timeout = timeout
+        self.selector = selectors.DefaultSelector()
+        self.sockets = {}
+
+        # Insertion order is also deadline order, oldest request first.
+        self.pending = {}
+        self.results = deque()
+        self.backlog = deque()
+        self.sequence = 0
+        self.exhausted = False
+        self.blocked = False
+
+    def active(self):
+        """Determine if any targets remain to be sent, answered, or reported."""
+        return not self.exhausted or any((self.backlog, self.pending, self.results))
+
+    def _socket(self, version):
+        """Get the socket for an IP version, opening it if needed."""
+        if version not in self.sockets:
+            self.sockets[version] = _open_socket(version)
+            self.selector.register(
+                self.sockets[version], selectors.EVENT_READ, version
+            )
+        return self.sockets[version]
+
+    def _send(self, address):
+        """Send an echo request to an address.
+
+        If the socket can't accept the request right now, the address is
+        held back until the socket is writable again.
+        """
+        version = 6 if ":" in address else 4
+        sock = self._socket(version)
+        self.sequence = (self.sequence + 1) & 0xFFFF
+
+        try:
+            sock.sendto(_echo_request(version, self.sequence), (address, 0))
+        except OSError as err:
+            if isinstance(err, BlockingIOError) or err.errno == errno.ENOBUFS:
+                self.backlog.appendleft(address)
+                self.blocked = True
+                events = selectors.EVENT_READ | selectors.EVENT_WRITE
+                self.selector.modify(sock, events, version)
+            else:
+                self.results.append((address, None))
+            return
+
+        deadline = time.monotonic() + self.timeout
+        request = (address, _packed(version, address), deadline)
+        self.pending[(version, self.sequence)] = request
+
+    def fill(self):
+        """Send requests until MAX_PENDING are outstanding.
+
+        Replies are read between sends, so that early replies aren't
+        timed as if they arrived at the end of the burst.
+        """
+        while not self.blocked and len(self.pending) < MAX_PENDING:
+            if self.backlog:
+                address = self.backlog.popleft()
+            else:
+                address = next(self.targets, None)
+            if address is None:
+                self.exhausted = True
+                return
+            self._send(address)
+            self.receive()
+
+    def _receive(self, sock, version):
+        """Read every reply waiting on a socket, timing each as it is read."""
+        while True:
+            try:
+                packet, source = sock.recvfrom(1500)
+            except (BlockingIOError, InterruptedError):
+                return
+            received = time.perf_counter()
+
+            reply = _echo_reply(version, packet)
+            if reply is None:
+                continue
+
+            sequence, sent = reply
+            # Scoped targets are rejected up front, so scoped sources never match.
+            request = self.pending.get((version, sequence))
+            if request is None or "%" in source[0]:
+                continue
+            if request[1] != _packed(version, source[0]):
+                continue
+            del self.pending[(version, sequence)]
+
+            # Replies read after the request's deadline count as timeouts.
+            rtt = (received - sent) * 1000
+            if rtt > self.timeout * 1000:
+                rtt = None
+            self.results.append((request[0], rtt))
+
+    def receive(self):
+        """Read replies from every socket without waiting."""
+        for version, sock in self.sockets.items():
+            self._receive(sock, version)
+
+    def wait(self):
+        """Wait for replies until the oldest request expires.
+
+        If nothing is outstanding but a socket is blocked, wait until it
+        is writable instead.
+        """
+        if self.pending:
+            _, _, deadline = next(iter(self.pending.values()))
+            wait = max(deadline - time.monotonic(), 0)
+        elif self.blocked:
+            wait = None
+        else:
+            return
+
+        for key, mask in self.selector.select(wait):
+            if mask & selectors.EVENT_WRITE:
+                self.blocked = False
+                self.selector.modify(key.fileobj, selectors.EVENT_READ, key.data)
+            if mask & selectors.EVENT_READ:
+                self._receive(key.fileobj, key.data)
+
+    def expire(self):
+        """Report requests whose deadline has passed as unreachable."""
+        self.receive()
+        now = time.monotonic()
+        while self.pending:
+            key, (address, _, deadline) = next(iter(self.pending.items()))
+            if deadline > now:
+                return
+            del self.pending[key]
+            self.results.append((address, None))
+
+    def close(self):
+        """Close the selector & all sockets."""
+        self.selector.close()
+        for sock in self.sockets.values():
+            sock.close()
+
+
+def run(targets, timeout, idle=None):
+    """Send a single ICMP echo request to each target.
+
+    Requests are sent as replies and timeouts free up room, so no more
+    than MAX_PENDING requests are outstanding at once. Replies are
+    matched to requests by ICMP sequence number & source address, and
+    are timed when read from the socket. Waiting replies are read before
+    each result is handed to the caller, so time spent handling results
+    is not counted towards round trip times. If idle is given, it is
+    called before waiting for replies, so the caller can act on the
+    results it has instead of holding them until the next reply or
+    timeout.
+
+    Arguments:
+        targets {iterable} -- IP address strings to ping
+        timeout {int|float} -- Seconds to wait for each reply
+        idle {callable} -- Called with no arguments before waiting
+
+    Returns:
+        {generator} -- Tuples of address & round trip time in
+        milliseconds (None if unreachable), in order of arrival
+    """
+    session = _Session(targets, timeout)
+    try:
+        while session.active():
+            session.fill()
+            if idle is not None:
+                idle()
+            session.wait()
+            session.expire()
+            while session.results:
+                session.receive()
+                yield session.results.popleft()
+    finally:
+        session.close()
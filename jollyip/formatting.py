@@ -1,5 +1,6 @@
 # Standard Library
 import re
+from functools import lru_cache
 
 # Third Party
 from click import ClickException, echo, style
@@ -16,6 +17,28 @@ WARNING = {"fg": "yellow"}
 WARNING_LABEL = {"fg": "red", "bold": True}
 
 
+@lru_cache(maxsize=256)
+def _compile_template(text, info_key):
+    """Split a text block into pre-styled chunks.
+
+    Arguments:
+        text {str} -- Text to format
+        info_key {frozenset} -- Items of the text format attributes
+
+    Returns:
+        {tuple} -- Pairs of styled chunk & placeholder name, where the
+        name is None for literal text
+    """
+    info = dict(info_key)
+    chunks = []
+    for i, chunk in enumerate(re.split(r"(\{\w+\})", text)):
+        if i % 2:
+            chunks.append((style(chunk, **info), chunk[1:-1]))
+        else:
+            chunks.append((style(chunk.format(), **info), None))
+    return tuple(chunks)
+
+
 def _base_formatter(info, label, text, callback, **kwargs):
     """Format text block, replace template strings with keyword arguments.
 
@@ -30,12 +53,11 @@ def _base_formatter(info, label, text, callback, **kwargs):
     """
     if callback is None:
         callback = style
-    for k, v in kwargs.items():
-        kwargs[k] = style(v, **label)
-    text_all = re.split(r"(\{\w+\})", text)
-    text_all = [style(i, **info) for i in text_all]
-    text_all = [i.format(**kwargs) for i in text_all]
-    text_fmt = "".join(text_all)
+    chunks = _compile_template(text, frozenset(info.items()))
+    text_fmt = "".join(
+        chunk if name is None else chunk.format(**{name: style(kwargs[name], **label)})
+        for chunk, name in chunks
+    )
     return callback(text_fmt)
 
 
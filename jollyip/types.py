@@ -10,6 +10,15 @@ class Number(ParamType):
     def convert(self, value, param, ctx):
         """Validate & convert input value to a float or integer."""
 
+        if isinstance(value, int):
+            return value
+
+        # Parse integer strings directly, without a lossy round trip through float.
+        try:
+            return int(value, 10)
+        except (TypeError, ValueError):
+            pass
+
         try:
             converted = float(value)
         except ValueError: